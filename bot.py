@@ -1,15 +1,24 @@
 import os
+import copy
 import json
 import time
 import re
+import sys
+import signal
 import asyncio
 import unicodedata
 from typing import List, Optional
-from collections import deque
+from collections import OrderedDict, deque
+from functools import lru_cache
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 
+try:
+    import orjson  # faster config (de)serialization when installed
+except ImportError:
+    orjson = None
+
 CONFIG_FILE = "config.json"
 GUILD_ID = int(os.getenv("GUILD_ID", "0"))  # set this in Railway for instant slash sync
 
@@ -28,32 +37,49 @@ UNICODE_FOLD_MAP = {
     "ý": "y",
     "ı": "i",
 }
-UNI_TRANS = str.maketrans(UNICODE_FOLD_MAP)
+
+RE_NON_ALNUM = re.compile(r"[^a-z0-9@\s]")
+
+# LEET_MAP, UNICODE_FOLD_MAP and every other ASCII char outside [a-z0-9\s] mapped
+# to a space, so leetspeak, letter folding and punctuation stripping share one
+# translate pass. The fold targets are plain a-z, which the other entries leave alone.
+NORMALIZE_TABLE = {
+    c: " " for c in range(128)
+    if not (chr(c) in "abcdefghijklmnopqrstuvwxyz0123456789" or chr(c).isspace())
+}
+NORMALIZE_TABLE.update(LEET_MAP)
+NORMALIZE_TABLE.update(str.maketrans(UNICODE_FOLD_MAP))
+
+# Every combining mark (category Mn) mapped to None, so str.translate drops them in C.
+# Built once at import (~2k entries).
+COMBINING_MARKS = dict.fromkeys(
+    c for c in range(sys.maxunicode + 1) if unicodedata.category(chr(c)) == "Mn"
+)
 
 def strip_accents(text: str) -> str:
-    nfkd = unicodedata.normalize("NFKD", text)
-    return "".join(ch for ch in nfkd if unicodedata.category(ch) != "Mn")
+    return unicodedata.normalize("NFKD", text).translate(COMBINING_MARKS)
 
 def normalize(text: str) -> str:
-    text = text.lower()
+    text = text.casefold()
+    if text.isascii():
+        # Nothing to decompose: NFKD and the combining-mark strip are no-ops on ASCII.
+        return " ".join(text.translate(NORMALIZE_TABLE).split())
     text = strip_accents(text)
-    text = text.translate(UNI_TRANS)
-    text = text.translate(LEET_MAP)
-    text = re.sub(r"[^a-z0-9@\s]", " ", text)  # keep @ for mentions
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
+    text = text.translate(NORMALIZE_TABLE)
+    if not text.isascii():
+        text = RE_NON_ALNUM.sub(" ", text)
+    return " ".join(text.split())
 
-def has_word(norm_text: str, word: str) -> bool:
-    return re.search(rf"\b{re.escape(word)}\b", norm_text) is not None
-
-def any_word(norm_text: str, words: List[str]) -> bool:
-    return any(has_word(norm_text, w) for w in words)
+def word_set_pattern(words) -> re.Pattern:
+    # One `\b(?:w1|w2|...)\b` scan instead of a search per word; longest first.
+    alts = sorted((re.escape(w) for w in words), key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(alts) + r")\b")
 
 # ---------------- Config ----------------
 def load_config():
     words_env = os.getenv("WORDS")
     window_env = os.getenv("WINDOW")
-    default_words = [w.strip().lower() for w in (words_env.split(",") if words_env else ["chunky","cheater"]) if w.strip()]
+    default_words = [w.strip().casefold() for w in (words_env.split(",") if words_env else ["chunky","cheater"]) if w.strip()]
     try:
         default_window = int(window_env) if window_env else 30
     except ValueError:
@@ -62,50 +88,92 @@ def load_config():
     cfg = {}
     if os.path.exists(CONFIG_FILE):
         try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                cfg = json.load(f)
+            with open(CONFIG_FILE, "rb") as f:
+                data = f.read()
+            cfg = orjson.loads(data) if orjson else json.loads(data)
         except Exception:
             cfg = {}
     cfg.setdefault("_default", {"words": default_words, "window": default_window})
     return cfg
 
 def save_config(cfg):
+    tmp = CONFIG_FILE + ".tmp"
     try:
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(cfg, f, indent=2)
+        if orjson:
+            data = orjson.dumps(cfg)
+        else:
+            data = json.dumps(cfg, separators=(",", ":")).encode("utf-8")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, CONFIG_FILE)
     except Exception:
         pass
 
 config = load_config()
 
+# Writes are coalesced: callers set the flag, the writer flushes a snapshot off the event loop.
+# Both are created in ModBot.setup_hook so the Event belongs to the loop bot.run() starts.
+CONFIG_SAVE_DELAY = 2.0
+_config_dirty: Optional[asyncio.Event] = None
+_config_writer_task: Optional[asyncio.Task] = None
+
+async def config_writer():
+    while True:
+        await _config_dirty.wait()
+        await asyncio.sleep(CONFIG_SAVE_DELAY)
+        _config_dirty.clear()
+        save = asyncio.ensure_future(asyncio.to_thread(save_config, copy.deepcopy(config)))
+        try:
+            await asyncio.shield(save)
+        except asyncio.CancelledError:
+            # Cancelling can't stop the worker thread; let its write finish so
+            # it never overlaps the final save in close().
+            await save
+            raise
+
+# Resolved per-guild dicts by int id, so the message path skips str(guild_id).
+# Entries alias the dicts inside `config`, which commands mutate in place.
+_guild_cfg_cache: dict[int, dict] = {}
+
 def get_guild_cfg(guild_id: int):
-    g = str(guild_id)
-    if g not in config:
-        config[g] = dict(config["_default"])
-        save_config(config)
-    return config[g]
+    gcfg = _guild_cfg_cache.get(guild_id)
+    if gcfg is None or gcfg is config["_default"]:
+        g = str(guild_id)
+        if g not in config:
+            # Not persisted on its own: a copy of the defaults only needs
+            # writing once a config command changes it (and sets the flag).
+            config[g] = dict(config["_default"])
+        gcfg = _guild_cfg_cache[guild_id] = config[g]
+    return gcfg
+
+def peek_guild_cfg(guild_id: int):
+    # Read-only lookup for the message path: guilds that never ran a config
+    # command use the defaults without creating (and persisting) an entry.
+    gcfg = _guild_cfg_cache.get(guild_id)
+    if gcfg is None:
+        gcfg = _guild_cfg_cache[guild_id] = config.get(str(guild_id)) or config["_default"]
+    return gcfg
 
 # ---------------- Confusable-aware pattern builder ----------------
+# Patterns only ever see normalize() output, where LEET_MAP has already turned
+# 0/1/3/4/5/7/8/@/$/+ into letters; the one look-alike pair left is i/l.
 CONFUSABLES = {
-    "i": ["i","l","1"],
-    "l": ["l","i","1"],
-    "o": ["o","0"],
-    "s": ["s","5","$"],
-    "e": ["e","3"],
-    "a": ["a","4","@"],
-    "t": ["t","7","+"],
-    "b": ["b","8"],
+    "i": "[il]",
+    "l": "[il]",
 }
 def confusable_group(ch: str) -> str:
-    opts = CONFUSABLES.get(ch, [ch])
-    return f"(?:{'|'.join(re.escape(o) for o in opts)})"
+    return CONFUSABLES.get(ch) or re.escape(ch)
 def confusable_spaced_pat(s: str) -> str:
     parts = [confusable_group(c) for c in s]
     return r"\s*".join(parts)
 
 # ---------------- Dynamic ban list ----------------
-def compile_ban_patterns(raw: str):
-    patterns = []
+def ban_alternation(alts: List[str]) -> re.Pattern:
+    # All words share one `\b(?:w1|w2|...)\b` scan instead of one search per word.
+    return re.compile(r"\b(?:" + "|".join(alts) + r")\b")
+
+def ban_word_alternatives(raw: str) -> List[str]:
+    alts = []
     for item in [x.strip() for x in raw.split(",") if x.strip()]:
         is_stem = item.endswith("*")
         base = item[:-1] if is_stem else item
@@ -113,143 +181,305 @@ def compile_ban_patterns(raw: str):
         if not base_norm:
             continue
         core = confusable_spaced_pat(base_norm)
-        if is_stem:
-            pat = rf"\b{core}[a-z0-9]*\b"
-        else:
-            pat = rf"\b{core}\b"
-        patterns.append(re.compile(pat))
-    return patterns
-
-BAN_PATTERNS = compile_ban_patterns(os.getenv("BAN_WORDS", ""))
+        alts.append(rf"{core}[a-z0-9]*" if is_stem else core)
+    return alts
 
 ALWAYS_BAN = {"hoe", "hoes", "cunt", "bitch", "bitches"}
-ALWAYS_PATTERNS = [re.compile(rf"\b{confusable_spaced_pat(normalize(w))}\b") for w in ALWAYS_BAN]
+
+# Built-in and BAN_WORDS entries share one pattern, so a single search decides.
+BANNED_PATTERN = ban_alternation(
+    [confusable_spaced_pat(normalize(w)) for w in ALWAYS_BAN]
+    + ban_word_alternatives(os.getenv("BAN_WORDS", ""))
+)
 
 def contains_banned_word(norm_text: str) -> bool:
-    for p in ALWAYS_PATTERNS:
-        if p.search(norm_text):
-            return True
-    for p in BAN_PATTERNS:
-        if p.search(norm_text):
-            return True
-    return False
+    return BANNED_PATTERN.search(norm_text) is not None
 
 # ---------------- Semantic rules ----------------
-PRONOUN_TARGETS = {
+# Single-message verdicts are memoized per (text, mention flag): raids and
+# copy-paste spam repeat the same normalized text many times. Aggregates almost
+# never repeat, so the rules themselves stay uncached for the aggregate path.
+RULE_CACHE_SIZE = 1024
+
+PRONOUN_TARGETS = frozenset({
     "you","u","ur","youre","he","she","they","him","her","them",
     "this","that","it","these","those",
     "bro","bros","dude","man","guy","guys","girl","girls","boy","boys",
     "buddy","pal","homie","sis","brother","sister","dawg"
-}
-CHEAT_STEMS = {"cheat","cheater","cheating","cheated","cheats"}
+})
+CHEAT_STEMS = frozenset({"cheat","cheater","cheating","cheated","cheats"})
+RE_PRONOUN = word_set_pattern(PRONOUN_TARGETS)
+RE_CHEAT_STEM = word_set_pattern(CHEAT_STEMS)
 
+# Callers compute is_directed() once per text and pass the result to each rule.
 def is_directed(norm_text: str, has_mention: bool) -> bool:
-    return has_mention or any_word(norm_text, list(PRONOUN_TARGETS))
+    return has_mention or RE_PRONOUN.search(norm_text) is not None
+
+RE_CHEAT_IS = re.compile(r"\b\w{2,}\s+(?:is|s|is a|s a|a)\s+cheat\w*\b")
+RE_CHEAT_STOP_OR_ARE = re.compile(r"\b(?:stop|is|are)\s+cheat\w*\b")
 
-def is_cheater_accusation(norm_text: str, has_mention: bool) -> bool:
-    if re.search(r"\b\w{2,}\s+(?:is|s|is a|s a|a)\s+cheat\w*\b", norm_text):
+def is_cheater_accusation(norm_text: str, directed: bool) -> bool:
+    # Every branch needs "cheat"; the substring test fails fast before the
+    # \w{2,} prefix of RE_CHEAT_IS gets to walk each word.
+    if "cheat" not in norm_text:
+        return False
+    if RE_CHEAT_IS.search(norm_text):
         return True
-    if any_word(norm_text, list(CHEAT_STEMS)):
-        if is_directed(norm_text, has_mention):
+    if RE_CHEAT_STEM.search(norm_text):
+        if directed:
             return True
-        if re.search(r"\bstop\s+cheat\w*\b", norm_text):
-            return True
-        if re.search(r"\b(is|are)\s+cheat\w*\b", norm_text):
+        if RE_CHEAT_STOP_OR_ARE.search(norm_text):
             return True
     return False
 
-def is_bitch_insult(norm_text: str, has_mention: bool) -> bool:
-    if re.search(r"\bbi?atch(es)?\b", norm_text) or has_word(norm_text, "bitch") or has_word(norm_text, "bitches"):
-        if is_directed(norm_text, has_mention):
+RE_BITCH = re.compile(r"\bb(?:i?a|i)tch(?:es)?\b")  # bitch, batch, biatch (+es)
+RE_BITCH_IS = re.compile(r"\b\w{2,}\s+(?:is|s|is a|s a|a)\s+bitch(?:es)?\b")
+
+def is_bitch_insult(norm_text: str, directed: bool) -> bool:
+    if RE_BITCH.search(norm_text):
+        if directed:
             return True
-        if re.search(r"\b\w{2,}\s+(?:is|s|is a|s a|a)\s+bitch(?:es)?\b", norm_text):
+        if RE_BITCH_IS.search(norm_text):
             return True
     return False
 
+RE_FUCK_YOU = re.compile(r"\bfu?c?k+\s*you\b|\bf\s*you\b|\bf\s*u\b|\bfu?h+\s*u\b")
+RE_FU = re.compile(r"\bfu\b")
+RE_YOU = re.compile(r"\byou\b")
+
 def is_fuck_you_super_strict(norm_text: str) -> bool:
-    if re.search(r"\bfu?c?k+\s*you\b", norm_text): return True
-    if re.search(r"\bf\s*you\b", norm_text): return True
-    if re.search(r"\bf\s*u\b", norm_text): return True
-    if re.search(r"\bfu?h+\s*u\b", norm_text): return True
-    if re.search(r"\bfu\b", norm_text) and has_word(norm_text, "you"): return True
-    return False
+    if RE_FUCK_YOU.search(norm_text): return True
+    return RE_FU.search(norm_text) is not None and RE_YOU.search(norm_text) is not None
 
-PLAYER_TERMS = {
+PLAYER_TERMS = frozenset({
     "player","playboy","womanizer","womaniser","womanizers","womanisers",
     "fboy","fboi","fuckboy","fuckboi","manwhore"
-}
-GIRL_WORDS = {"girl","girls","woman","women","female","females","hoe","hoes"}
-QTY_WORDS = {"hella","many","every","all","lots","lot","alot","a lot"}
-
-def is_player_implication(norm_text: str, has_mention: bool) -> bool:
-    if any_word(norm_text, list(PLAYER_TERMS)) or "player" in norm_text:
-        if is_directed(norm_text, has_mention): return True
-        if re.search(r"\b\w{2,}\s+(?:is|s|is a|s a|a)\s+player\b", norm_text): return True
-    if (any_word(norm_text, list(QTY_WORDS)) and any_word(norm_text, list(GIRL_WORDS))):
-        if re.search(r"\b(got|has|have)\b", norm_text) or is_directed(norm_text, has_mention): return True
-    qty = r"(a\s+lot\s+of|many|every|all|lots\s+of|hella)"
-    girls = r"(girls?|women|females?|hoes?)"
-    if re.search(rf"\b(talk|text|dm|message|chat)(s|ed|ing)?\s+(to|with)\s+{qty}\s+{girls}\b", norm_text): return True
-    if re.search(rf"\b(flirt|rizz)(s|ed|ing)?\s+(with\s+)?{qty}\s+{girls}\b", norm_text): return True
-    if re.search(r"\b(slide|sliding|slid|slides)\s+(in|into)\s+(\w+\s+)?dm(s)?\b", norm_text) and (
-        any_word(norm_text, ["everyone","every","all","many","hella"]) or any_word(norm_text, list(GIRL_WORDS))
+})
+GIRL_WORDS = frozenset({"girl","girls","woman","women","female","females","hoe","hoes"})
+QTY_WORDS = frozenset({"hella","many","every","all","lots","lot","alot","a lot"})
+RE_PLAYER_TERM = word_set_pattern(PLAYER_TERMS)
+RE_GIRL_WORD = word_set_pattern(GIRL_WORDS)
+RE_QTY_WORD = word_set_pattern(QTY_WORDS)
+RE_SLIDE_QTY = word_set_pattern(["everyone","every","all","many","hella"])
+
+_QTY = r"(?:a\s+lot\s+of|many|every|all|lots\s+of|hella)"
+_GIRLS = r"(?:girls?|women|females?|hoes?)"
+RE_PLAYER_IS = re.compile(r"\b\w{2,}\s+(?:is|s|is a|s a|a)\s+player\b")
+RE_HAS = re.compile(r"\b(?:got|has|have)\b")
+RE_CHASING_GIRLS = re.compile(
+    rf"\b(?:talk|text|dm|message|chat)(?:s|ed|ing)?\s+(?:to|with)\s+{_QTY}\s+{_GIRLS}\b"
+    rf"|\b(?:flirt|rizz)(?:s|ed|ing)?\s+(?:with\s+)?{_QTY}\s+{_GIRLS}\b"
+)
+RE_SLIDE_DMS = re.compile(r"\b(?:slide|sliding|slid|slides)\s+(?:in|into)\s+(?:\w+\s+)?dms?\b")
+
+def is_player_implication(norm_text: str, directed: bool) -> bool:
+    if "player" in norm_text or RE_PLAYER_TERM.search(norm_text):
+        if directed: return True
+        if RE_PLAYER_IS.search(norm_text): return True
+    if RE_QTY_WORD.search(norm_text) and RE_GIRL_WORD.search(norm_text):
+        if RE_HAS.search(norm_text) or directed: return True
+    if RE_CHASING_GIRLS.search(norm_text): return True
+    if RE_SLIDE_DMS.search(norm_text) and (
+        RE_SLIDE_QTY.search(norm_text) or RE_GIRL_WORD.search(norm_text)
     ): return True
     return False
 
-def is_loyalty_implication(norm_text: str, has_mention: bool) -> bool:
-    if re.search(r"\b\w{2,}\s+(?:lacks|lack|has\s+no|got\s+no|no)\s+loyalty\b", norm_text): return True
-    if re.search(r"\b\w{2,}\s+(?:is|s|isn t|isnt|ain t|aint|not)\s+loyal\b", norm_text): return True
-    if is_directed(norm_text, has_mention) and re.search(r"\b(disloyal|unloyal|unfaithful|not\s+faithful)\b", norm_text): return True
-    if re.search(r"\b(go|goes|going|went|move|moves|moving|bounce|bounces|bouncing|hop|hops|hopping|switch|switches|switching|jump|jumps|jumping)\s+from\s+(girl|girls|woman|women|female|females)\s+to\s+(girl|girls|woman|women|female|females)\b", norm_text): return True
-    if re.search(r"\b(new|another|different)\s+girl\s+(each|every|per)\s+(day|night|week|month)\b", norm_text): return True
-    if re.search(r"\b(every|each)\s+(day|night|week|month)\s+(a\s+)?(new|different)\s+girl\b", norm_text): return True
-    if re.search(r"\b(has|got|have)\s+(a\s+)?(roster|rotation)\b", norm_text) and any_word(norm_text, list(GIRL_WORDS)): return True
+_GIRL = r"(?:girl|girls|woman|women|female|females)"
+RE_DISLOYALTY = re.compile(
+    r"\b\w{2,}\s+(?:lacks|lack|has\s+no|got\s+no|no)\s+loyalty\b"
+    r"|\b\w{2,}\s+(?:is|s|isn t|isnt|ain t|aint|not)\s+loyal\b"
+    rf"|\b(?:go|goes|going|went|move|moves|moving|bounce|bounces|bouncing|hop|hops|hopping|switch|switches|switching|jump|jumps|jumping)\s+from\s+{_GIRL}\s+to\s+{_GIRL}\b"
+    r"|\b(?:new|another|different)\s+girl\s+(?:each|every|per)\s+(?:day|night|week|month)\b"
+    r"|\b(?:every|each)\s+(?:day|night|week|month)\s+(?:a\s+)?(?:new|different)\s+girl\b"
+)
+RE_DISLOYAL = re.compile(r"\b(?:disloyal|unloyal|unfaithful|not\s+faithful)\b")
+RE_ROSTER = re.compile(r"\b(?:has|got|have)\s+(?:a\s+)?(?:roster|rotation)\b")
+
+def is_loyalty_implication(norm_text: str, directed: bool) -> bool:
+    if RE_DISLOYALTY.search(norm_text): return True
+    if directed and RE_DISLOYAL.search(norm_text): return True
+    if RE_ROSTER.search(norm_text) and RE_GIRL_WORD.search(norm_text): return True
     return False
 
+# Each rule above needs at least one of these fragments to fire, so text without
+# any of them can skip the whole ladder in one scan. Keep in sync with the rules.
+RE_RULE_TRIGGER = re.compile(
+    r"cheat"                                        # cheater accusation
+    r"|b(?:i?a|i)tch"                               # bitch insult
+    r"|\bf(?:[uckh]|\s*you|\s*u\b)"                 # super-strict f you
+    r"|play|wom|fbo|fuckbo|manwhore|girl|female|hoe|dm"  # player (girl words also cover loyalty)
+    r"|loyal|faithful"                              # loyalty
+)
+
+def may_trigger_rules(norm_text: str) -> bool:
+    return RE_RULE_TRIGGER.search(norm_text) is not None
+
+RE_LETTER = re.compile(r"[a-z]")
+
+# Runs inline on the event loop: re holds the GIL while matching, so a worker
+# thread would only add a hop per message (repeats are served from the cache).
+@lru_cache(maxsize=RULE_CACHE_SIZE)
+def classify_message(norm_text: str, has_mention: bool) -> Optional[str]:
+    """Reason one message on its own should be deleted, or None."""
+    # Cheapest first: the ban list is one pattern; the semantic rules run several.
+    if contains_banned_word(norm_text):
+        return "banned"
+    # Text that is too short or has no letters can't trip a semantic rule.
+    if len(norm_text) < 2 or RE_LETTER.search(norm_text) is None:
+        return None
+    if not may_trigger_rules(norm_text):
+        return None
+    directed = is_directed(norm_text, has_mention)
+    if is_fuck_you_super_strict(norm_text):
+        return "fuck_you"
+    if is_bitch_insult(norm_text, directed):
+        return "bitch"
+    if is_cheater_accusation(norm_text, directed):
+        return "cheater"
+    if is_player_implication(norm_text, directed):
+        return "player"
+    if is_loyalty_implication(norm_text, directed):
+        return "loyalty"
+    return None
+
 # ---------------- Recent message buffer ----------------
 MAX_RECENT = 10
-recent_msgs = {}
-
-def get_aggregate_text(dq: deque, now: float, window: int) -> tuple[str, bool, list]:
-    while dq and (now - dq[0]["time"]) > window:
-        dq.popleft()
-    agg_text = " ".join(item["norm"] for item in dq)
-    agg_mentions = any(item["had_mention"] for item in dq)
-    recent = [item for item in dq if (now - item["time"]) <= window]
-    return agg_text, agg_mentions, recent
-
-async def delete_recent_user_msgs(channel: discord.TextChannel, recent_items: list):
-    to_delete_objs = [it["msg"] for it in recent_items if it.get("msg") is not None]
-    missing_ids = [it["id"] for it in recent_items if it.get("msg") is None]
-    if missing_ids:
-        fetch_tasks = [channel.fetch_message(mid) for mid in missing_ids]
-        for fut in asyncio.as_completed(fetch_tasks):
+MAX_RECENT_KEYS = 10000
+RECENT_TTL = 600  # longest window !setwindow allows; WINDOW and config.json can exceed it
+INTERN_MAX_LEN = 64
+
+class RecentBuffer:
+    # One author's recent messages in one channel, one parallel deque per field
+    # (index i across them is the same message). `text` is always " ".join(norms)
+    # and `mentions` the count of True in had_mention, updated as messages come and go.
+    __slots__ = ("norms", "times", "had_mention", "ids", "msgs", "text", "mentions")
+
+    def __init__(self):
+        self.norms: deque = deque()
+        self.times: deque = deque()
+        self.had_mention: deque = deque()
+        self.ids: deque = deque()
+        self.msgs: deque = deque()
+        self.text = ""
+        self.mentions = 0
+
+    def append(self, norm: str, t: float, had_mention: bool, msg_id: int, msg: Optional[discord.Message]):
+        if len(self.norms) >= MAX_RECENT:
+            self.popleft()
+        self.text = f"{self.text} {norm}" if self.norms else norm
+        self.norms.append(norm)
+        self.times.append(t)
+        self.had_mention.append(had_mention)
+        self.ids.append(msg_id)
+        self.msgs.append(msg)
+        self.mentions += had_mention
+
+    def popleft(self):
+        norm = self.norms.popleft()
+        self.times.popleft()
+        self.mentions -= self.had_mention.popleft()
+        self.ids.popleft()
+        self.msgs.popleft()
+        self.text = self.text[len(norm) + 1:] if self.norms else ""
+
+# LRU order: the least recently active (guild, channel, author) buffers sit at the front.
+# Item times come from time.monotonic(), so buffers are only meaningful within one process.
+recent_msgs: "OrderedDict[tuple, RecentBuffer]" = OrderedDict()
+
+def get_recent_buffer(key: tuple) -> RecentBuffer:
+    buf = recent_msgs.get(key)
+    if buf is None:
+        buf = RecentBuffer()
+        recent_msgs[key] = buf
+        if len(recent_msgs) > MAX_RECENT_KEYS:
+            recent_msgs.popitem(last=False)
+    else:
+        recent_msgs.move_to_end(key)
+    return buf
+
+def recent_ttl() -> int:
+    # A buffer may be dropped once it is older than every window in use.
+    return max(RECENT_TTL, *(g["window"] for g in config.values()))
+
+def sweep_recent_msgs(now: float):
+    ttl = recent_ttl()
+    # Buffers are in LRU order, so everything after the first fresh one is fresh too.
+    while recent_msgs:
+        key, buf = next(iter(recent_msgs.items()))
+        if buf.times and (now - buf.times[-1]) <= ttl:
+            return
+        del recent_msgs[key]
+
+@tasks.loop(minutes=5)
+async def prune_recent_msgs():
+    sweep_recent_msgs(time.monotonic())
+
+def get_aggregate_text(buf: RecentBuffer, now: float, window: int) -> tuple[str, bool, deque]:
+    times = buf.times
+    while times and (now - times[0]) > window:
+        buf.popleft()
+    return buf.text, buf.mentions > 0, buf.norms
+
+async def delete_recent_user_msgs(channel: discord.TextChannel, buf: RecentBuffer):
+    # Snapshot before the first await: other messages may change buf while we delete.
+    # Deleting only needs the id, so entries without a Message get a local partial one (no fetch).
+    # Each buffered entry is a distinct message, so no de-duplication is needed.
+    msgs = [
+        m if m is not None else channel.get_partial_message(i)
+        for i, m in zip(buf.ids, buf.msgs)
+    ]
+    for i in range(0, len(msgs), 100):  # bulk delete takes at most 100 messages
+        batch = msgs[i:i + 100]
+        if len(batch) >= 2:
+            try:
+                await channel.delete_messages(batch)
+                continue
+            except (discord.Forbidden, discord.HTTPException):
+                pass
+        for m in batch:
             try:
-                m = await fut
-                to_delete_objs.append(m)
+                await m.delete()
             except (discord.NotFound, discord.Forbidden, discord.HTTPException):
                 pass
-    uniq = {}
-    for m in to_delete_objs:
-        if m: uniq[m.id] = m
-    batch = list(uniq.values())[:100]
-    if len(batch) >= 2:
-        try:
-            await channel.delete_messages(batch)
-            return
-        except (discord.Forbidden, discord.HTTPException):
-            pass
-    for m in batch:
+
+# ---------------- Bot setup ----------------
+class ModBot(commands.Bot):
+    _sigterm_task: Optional[asyncio.Task] = None  # held so the loop's weak ref isn't the only one
+
+    async def setup_hook(self):
+        global _config_dirty, _config_writer_task
+        _config_dirty = asyncio.Event()
+        _config_writer_task = asyncio.create_task(config_writer())
+        # Hosts stop the process with SIGTERM; close cleanly so pending config is saved.
         try:
-            await m.delete()
-        except (discord.NotFound, discord.Forbidden, discord.HTTPException):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, self._on_sigterm)
+        except NotImplementedError:  # no loop signal handlers on Windows
             pass
+        prune_recent_msgs.start()
+
+    def _on_sigterm(self):
+        if self._sigterm_task is None:
+            self._sigterm_task = asyncio.create_task(self.close())
+
+    async def close(self):
+        await super().close()
+        # Stop the writer (waiting out any write in progress) before saving here,
+        # so the two never write config.json.tmp at the same time.
+        if _config_writer_task is not None:
+            _config_writer_task.cancel()
+            try:
+                await _config_writer_task
+            except asyncio.CancelledError:
+                pass
+        # A change still waiting out CONFIG_SAVE_DELAY would otherwise be lost.
+        if _config_dirty is not None and _config_dirty.is_set():
+            _config_dirty.clear()
+            save_config(config)
 
-# ---------------- Bot setup ----------------
 intents = discord.Intents.default()
 intents.message_content = True
 intents.messages = True
-bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
+bot = ModBot(command_prefix="!", intents=intents, help_command=None)
 
 def is_guild_manager():
     async def predicate(ctx):
@@ -260,6 +490,7 @@ def is_guild_manager():
 @bot.tree.command(name="speak", description="Make the bot say something in a channel")
 @app_commands.describe(text="What should I say?", channel="Where to send it (optional)")
 @app_commands.default_permissions(manage_guild=True)
+@app_commands.checks.has_permissions(manage_guild=True)
 @app_commands.guild_only()
 async def speak_slash(
     interaction: discord.Interaction,
@@ -267,9 +498,6 @@ async def speak_slash(
     channel: Optional[discord.TextChannel] = None
 ):
     target = channel or interaction.channel
-    if not interaction.user.guild_permissions.manage_guild:
-        await interaction.response.send_message("You need Manage Server to use this.", ephemeral=True)
-        return
     try:
         await target.send(text)
         await interaction.response.send_message("Sent ✅", ephemeral=True)
@@ -281,6 +509,13 @@ async def speak_slash(
 async def ping_slash(interaction: discord.Interaction):
     await interaction.response.send_message("Pong! ✅", ephemeral=True)
 
+@bot.tree.error
+async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if isinstance(error, app_commands.MissingPermissions):
+        await interaction.response.send_message("You need Manage Server to use this.", ephemeral=True)
+        return
+    await app_commands.CommandTree.on_error(bot.tree, interaction, error)
+
 # ---- Fallback prefix: manual sync from Discord if needed ----
 @bot.command(name="syncslash")
 @is_guild_manager()
@@ -317,13 +552,13 @@ async def config_cmd(ctx):
 @bot.command(name="setwords")
 @is_guild_manager()
 async def setwords_cmd(ctx, *, args: str):
-    words = [w.strip().lower() for w in args.split(",") if w.strip()]
+    words = [w.strip().casefold() for w in args.split(",") if w.strip()]
     if len(words) < 2:
         await ctx.reply("Please provide at least **two** words, e.g. `!setwords chunky, cheater`")
         return
     gcfg = get_guild_cfg(ctx.guild.id)
     gcfg["words"] = words
-    save_config(config)
+    _config_dirty.set()
     await ctx.reply(f"Updated word combo to: {words}")
 
 @bot.command(name="setwindow")
@@ -334,10 +569,12 @@ async def setwindow_cmd(ctx, seconds: int):
         return
     gcfg = get_guild_cfg(ctx.guild.id)
     gcfg["window"] = seconds
-    save_config(config)
+    _config_dirty.set()
     await ctx.reply(f"Back-to-back window set to {seconds} seconds.")
 
 # ---------------- Ready & message events ----------------
+_tree_synced = False
+
 @bot.event
 async def on_ready():
     print(f"Logged in as {bot.user} (ID: {bot.user.id})")
@@ -349,6 +586,10 @@ async def on_ready():
     else:
         print("Bot is not in any guilds yet.")
 
+    # on_ready fires again after every reconnect; the command tree only needs syncing once.
+    global _tree_synced
+    if _tree_synced:
+        return
     try:
         if GUILD_ID:
             guild = discord.Object(id=GUILD_ID)
@@ -357,12 +598,24 @@ async def on_ready():
         else:
             await bot.tree.sync()              # global (can be slow to appear)
             print("Slash commands synced globally")
+        _tree_synced = True
     except Exception as e:
         print("Slash sync failed:", e)
 
+@lru_cache(maxsize=256)
+def compile_combo(words: tuple):
+    # Returns a predicate telling whether the text contains every combo word: an
+    # inlined `and` chain, e.g. lambda t: 'a' in t and 'b' in t, which stops at the
+    # first missing word. repr() always yields a plain string literal, so
+    # user-supplied words cannot inject code.
+    expr = " and ".join(f"{w!r} in t" for w in words) or "True"
+    return eval(f"lambda t: {expr}", {"__builtins__": {}})
+
 def contains_all_words(text: str, words: List[str]) -> bool:
-    text = text.lower()
-    return all(w in text for w in words)
+    # text must already be normalized (casefolded); words are casefolded when configured.
+    if not words:
+        return True
+    return compile_combo(tuple(words))(text)
 
 @bot.event
 async def on_message(message: discord.Message):
@@ -372,60 +625,49 @@ async def on_message(message: discord.Message):
     # BOT BYPASS: ignore bot messages so the bot can say anything without deletion
     if message.author.bot or not message.guild:
         return
+    # Attachment/sticker/embed-only posts have no text to moderate.
+    if not message.content or message.content.isspace():
+        return
 
-    gcfg = get_guild_cfg(message.guild.id)
+    gcfg = peek_guild_cfg(message.guild.id)
     combo_words = gcfg["words"]
     window = gcfg["window"]
 
     content_norm = normalize(message.content)
+    if len(content_norm) < INTERN_MAX_LEN:
+        # Short messages ("lol", "gg") repeat a lot; share one copy across buffers.
+        content_norm = sys.intern(content_norm)
     had_mention = bool(message.mentions)
-    now = time.time()
+    now = time.monotonic()
 
     # ---------- Single-message checks ----------
-    if is_fuck_you_super_strict(content_norm):
-        try: await message.delete()
-        except discord.Forbidden: pass
-        return
-    if is_bitch_insult(content_norm, had_mention):
-        try: await message.delete()
-        except discord.Forbidden: pass
-        return
-    if is_cheater_accusation(content_norm, had_mention):
-        try: await message.delete()
-        except discord.Forbidden: pass
-        return
-    if is_player_implication(content_norm, had_mention):
-        try: await message.delete()
-        except discord.Forbidden: pass
-        return
-    if is_loyalty_implication(content_norm, had_mention):
-        try: await message.delete()
-        except discord.Forbidden: pass
-        return
-    if contains_banned_word(content_norm):
+    if classify_message(content_norm, had_mention):
         try: await message.delete()
         except discord.Forbidden: pass
         return
 
     # ---------- Buffer & aggregate (multi-message) ----------
     key = (message.guild.id, message.channel.id, message.author.id)
-    dq = recent_msgs.get(key)
-    if dq is None:
-        dq = deque(maxlen=MAX_RECENT)
-        recent_msgs[key] = dq
-    dq.append({"norm": content_norm, "time": now, "had_mention": had_mention, "id": message.id, "msg": message})
-
-    agg_text, agg_mentions, recent_items = get_aggregate_text(dq, now, window)
-    if (
-        contains_all_words(agg_text, combo_words) or
-        contains_banned_word(agg_text) or
-        is_fuck_you_super_strict(agg_text) or
-        is_cheater_accusation(agg_text, agg_mentions) or
-        is_player_implication(agg_text, agg_mentions) or
-        is_loyalty_implication(agg_text, agg_mentions)
-    ):
-        await delete_recent_user_msgs(message.channel, recent_items)
+    buf = get_recent_buffer(key)
+    buf.append(content_norm, now, had_mention, message.id, message)
+
+    agg_text, agg_mentions, recent_norms = get_aggregate_text(buf, now, window)
+    # With only this message in the window the aggregate is content_norm, which
+    # already passed the single-message checks; only the combo test is new.
+    cross_message = len(recent_norms) > 1
+    if contains_all_words(agg_text, combo_words) or (cross_message and contains_banned_word(agg_text)):
+        await delete_recent_user_msgs(message.channel, buf)
         return
+    if cross_message and may_trigger_rules(agg_text):
+        agg_directed = is_directed(agg_text, agg_mentions)
+        if (
+            is_fuck_you_super_strict(agg_text) or
+            is_cheater_accusation(agg_text, agg_directed) or
+            is_player_implication(agg_text, agg_directed) or
+            is_loyalty_implication(agg_text, agg_directed)
+        ):
+            await delete_recent_user_msgs(message.channel, buf)
+            return
 
 # ---------------- Run the bot ----------------
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")